@@ -1,23 +1,14 @@
 #include "integer.hpp"
+#include <array>
 #include <iostream>
 #include <string>
 
-int main() {
-    // Read operation and operands from stdin
-    // Format: OP OP1 OP2
-    // e.g.: + 123 456
-    std::string op;
-    std::string s1, s2;
+namespace {
 
-    if (!(std::cin >> op >> s1 >> s2)) {
-        return 0;
-    }
+// Operations answered by an "all" request, in output order
+constexpr std::array<const char *, 4> ALL_OPERATIONS = {"+", "-", "*", "/"};
 
-    integer a(s1);
-    integer b(s2);
-    integer res;
-
-    // Perform operation
+bool apply(const std::string &op, const integer &a, const integer &b, integer &res) {
     if (op == "+") {
         res = a + b;
     } else if (op == "-") {
@@ -28,10 +19,44 @@ int main() {
         // Integer division
         res = a / b;
     } else {
-        std::cerr << "Unknown operation: " << op << std::endl;
-        return 1;
+        return false;
     }
+    return true;
+}
 
-    std::cout << res.to_string() << std::endl;
+}  // namespace
+
+int main() {
+    // Read operations and operands from stdin until EOF
+    // Format: OP OP1 OP2 (one request per line, one result line per request)
+    // e.g.: + 123 456
+    // OP "all" parses the operands once and answers + - * / as four result lines
+    // Operands can be millions of digits; skip the per-character C stdio synchronisation
+    std::ios::sync_with_stdio(false);
+    std::cin.tie(nullptr);
+
+    std::string op;
+    std::string s1, s2;
+
+    while (std::cin >> op >> s1 >> s2) {
+        integer a(s1);
+        integer b(s2);
+        integer res;
+
+        if (op == "all") {
+            for (const char *each : ALL_OPERATIONS) {
+                apply(each, a, b, res);
+                std::cout << res.to_string() << '\n';
+            }
+        } else if (apply(op, a, b, res)) {
+            std::cout << res.to_string() << '\n';
+        } else {
+            std::cerr << "Unknown operation: " << op << std::endl;
+            return 1;
+        }
+
+        // Flush every answer so a caller can keep one process open for many requests
+        std::cout.flush();
+    }
     return 0;
 }
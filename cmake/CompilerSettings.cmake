@@ -30,3 +30,33 @@ function(auto_detect_sanitizers target)
     target_compile_options(${target} PRIVATE ${_sanitizers})
     target_link_options(${target} PRIVATE ${_sanitizers})
 endfunction()
+
+function(auto_detect_pgo target visibility)
+    if(INTEGER_PGO STREQUAL "OFF")
+        return()
+    endif()
+
+    if(NOT CMAKE_CXX_COMPILER_ID STREQUAL "GNU")
+        message(FATAL_ERROR "INTEGER_PGO is only supported with GCC (got ${CMAKE_CXX_COMPILER_ID})")
+    endif()
+
+    if(INTEGER_PGO STREQUAL "GENERATE")
+        set(_compile_flags -fprofile-generate=${INTEGER_PGO_DIR})
+        set(_link_flags -fprofile-generate=${INTEGER_PGO_DIR})
+    elseif(INTEGER_PGO STREQUAL "USE")
+        # Targets that were not part of the training run simply have no profile
+        set(_compile_flags -fprofile-use=${INTEGER_PGO_DIR} -fprofile-correction
+            -Wno-missing-profile -Wno-error=coverage-mismatch)
+        set(_link_flags -fprofile-use=${INTEGER_PGO_DIR})
+    else()
+        message(FATAL_ERROR "INTEGER_PGO must be OFF, GENERATE or USE (got ${INTEGER_PGO})")
+    endif()
+
+    if(visibility STREQUAL "INTERFACE")
+        target_compile_options(${target} INTERFACE ${_compile_flags})
+        target_link_options(${target} INTERFACE ${_link_flags})
+    else()
+        target_compile_options(${target} PRIVATE ${_compile_flags})
+        target_link_options(${target} PRIVATE ${_link_flags})
+    endif()
+endfunction()
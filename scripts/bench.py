@@ -4,7 +4,12 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import os
+import re
+import shutil
+import statistics
 import subprocess
 import sys
 from dataclasses import dataclass
@@ -13,6 +18,25 @@ from pathlib import Path
 from typing import Dict, List
 
 
+SOURCE_DIR = Path(__file__).resolve().parent.parent
+# Multiplication sizes replayed by the instrumented binary to record a PGO profile.
+PGO_TRAINING_FILTER = "BM_IntegerMultiply/(50000|200000)$"
+# A recorded profile stays valid while these inputs (and the training filter) are unchanged.
+PGO_PROFILE_INPUTS = (
+    "include/integer.hpp",
+    "benchmarks/bench_integer.cpp",
+    "CMakeLists.txt",
+    "cmake/CompilerSettings.cmake",
+)
+# ... and while the toolchain and flags recorded in the build's CMakeCache.txt are unchanged.
+PGO_CACHE_ENTRIES = (
+    "CMAKE_CXX_COMPILER",
+    "CMAKE_BUILD_TYPE",
+    "CMAKE_CXX_FLAGS",
+    "CMAKE_CXX_FLAGS_RELEASE",
+    "INTEGER_ENABLE_LTO",
+)
+
 TIME_FACTORS = {
     "ns": 1e-9,
     "us": 1e-6,
@@ -20,6 +44,10 @@ TIME_FACTORS = {
     "s": 1.0,
 }
 
+# Aggregate rows (".../10000_median") do not match the trailing anchor.
+MULTIPLY_NAME_RE = re.compile(r"^BM_IntegerMultiply/(\d+)$")
+CALIBRATION_NAME_RE = re.compile(r"^BM_MachineCalibration/(\d+)$")
+
 
 @dataclass
 class BenchmarkResult:
@@ -43,34 +71,122 @@ def run_process(command: List[str], cwd: Path | None = None) -> subprocess.Compl
     return subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True)
 
 
+def pgo_profile_key(build_dir: Path) -> str:
+    digest = hashlib.sha256(PGO_TRAINING_FILTER.encode("utf-8"))
+    for relative in PGO_PROFILE_INPUTS:
+        digest.update(b"|")
+        digest.update((SOURCE_DIR / relative).read_bytes())
+    compiler = None
+    cache = (build_dir / "CMakeCache.txt").read_text(encoding="utf-8", errors="ignore")
+    for line in cache.splitlines():
+        name, _, value = line.partition("=")
+        if name.split(":", 1)[0] in PGO_CACHE_ENTRIES:
+            digest.update(b"|")
+            digest.update(line.encode("utf-8"))
+            if name.startswith("CMAKE_CXX_COMPILER:"):
+                compiler = value
+    # The cached path stays the same when the compiler behind it is upgraded; hash its version banner too.
+    if compiler:
+        digest.update(b"|")
+        digest.update(run_process([compiler, "--version"]).stdout.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def pgo_build_dir(build_dir: Path) -> Path:
+    # PGO builds live in their own tree so the regular build (ctest, update_baseline.py) never picks them up.
+    return build_dir / "pgo-build"
+
+
+def build_with_pgo(build_dir: Path, benchmark_binary: Path) -> None:
+    # Instrumented build -> training run -> rebuild with the recorded profile.
+    # The first two steps are skipped when the stored profile was recorded from the same inputs.
+    profile_dir = (build_dir / "pgo").resolve()
+    key_file = profile_dir / "profile.key"
+    configure = [
+        "cmake", "-S", str(SOURCE_DIR), "-B", str(build_dir),
+        "-DCMAKE_BUILD_TYPE=Release", "-DBUILD_TESTING=OFF", f"-DINTEGER_PGO_DIR={profile_dir}",
+    ]
+    build = ["cmake", "--build", str(build_dir), "--target", "integer_benchmark"]
+    # Configure first so the key sees the compiler and flags this build will actually use.
+    run_process(configure)
+    key = pgo_profile_key(build_dir)
+    if not key_file.exists() or key_file.read_text(encoding="utf-8") != key:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        run_process(configure + ["-DINTEGER_PGO=GENERATE"])
+        run_process(build)
+        run_process([str(benchmark_binary), f"--benchmark_filter={PGO_TRAINING_FILTER}"])
+        if not any(profile_dir.rglob("*.gcda")):
+            raise RuntimeError(f"PGO training run wrote no profile data to {profile_dir}")
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        key_file.write_text(key, encoding="utf-8")
+    run_process(configure + ["-DINTEGER_PGO=USE"])
+    run_process(build)
+
+
+def cpu_pinning_error(cpu: int) -> str | None:
+    # Validate --cpu up front; sched_setaffinity would only fail later with a bare EINVAL.
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    allowed = sorted(os.sched_getaffinity(0))
+    if cpu not in allowed:
+        return f"--cpu {cpu} is not available to this process; choose one of {', '.join(map(str, allowed))}"
+    return None
+
+
+def pin_to_cpu(cpu: int) -> None:
+    # Child processes inherit affinity and niceness, so this also pins the benchmark binary.
+    if not hasattr(os, "sched_setaffinity"):
+        print("CPU pinning is not supported on this platform; running unpinned", file=sys.stderr)
+        return
+    os.sched_setaffinity(0, {cpu})
+    try:
+        os.nice(-5)
+    except PermissionError:
+        pass
+
+
 def load_baseline(path: Path) -> Dict:
     with path.open("r", encoding="utf-8") as handle:
         return json.load(handle)
 
 
-def parse_named_benchmark_payload(payload: Dict, prefix: str) -> List[BenchmarkResult]:
-    results: List[BenchmarkResult] = []
+def benchmark_command(binary: Path, repetitions: int = 1) -> List[str]:
+    command = [str(binary), "--benchmark_format=json"]
+    if repetitions > 1:
+        command.append(f"--benchmark_repetitions={repetitions}")
+    return command
+
+
+def times_by_digits(times: Dict[str, float]) -> Dict[int, float]:
+    # JSON object keys are strings; key by digit count once instead of formatting str(digits) per lookup.
+    return {int(digits): value for digits, value in times.items()}
+
+
+def parse_named_benchmark_payload(payload: Dict, pattern: re.Pattern[str]) -> List[BenchmarkResult]:
+    # Repeated runs emit one row per repetition; keep the median so a single noisy sample cannot skew a score.
+    samples: Dict[int, List[float]] = {}
+    match_name = pattern.match
+    factor_get = TIME_FACTORS.get
     for entry in payload.get("benchmarks", []):
-        name = entry.get("name", "")
-        if not name.startswith(prefix):
-            continue
-        try:
-            digits = int(name.split("/")[1])
-        except (ValueError, IndexError):
+        match = match_name(entry.get("name", ""))
+        if match is None:
             continue
-        time_unit = entry.get("time_unit", "ns")
-        factor = TIME_FACTORS.get(time_unit, 1.0)
+        digits = int(match.group(1))
+        factor = factor_get(entry.get("time_unit", "ns"), 1.0)
         time_seconds = entry.get("real_time", 0.0) * factor
-        results.append(BenchmarkResult(digits=digits, time_seconds=time_seconds))
-    return results
+        samples.setdefault(digits, []).append(time_seconds)
+    return [
+        BenchmarkResult(digits=digits, time_seconds=statistics.median(times))
+        for digits, times in samples.items()
+    ]
 
 
 def parse_benchmark_payload(payload: Dict) -> List[BenchmarkResult]:
-    return parse_named_benchmark_payload(payload, "BM_IntegerMultiply/")
+    return parse_named_benchmark_payload(payload, MULTIPLY_NAME_RE)
 
 
 def parse_calibration_payload(payload: Dict) -> List[BenchmarkResult]:
-    return parse_named_benchmark_payload(payload, "BM_MachineCalibration/")
+    return parse_named_benchmark_payload(payload, CALIBRATION_NAME_RE)
 
 
 def compute_scores(
@@ -79,8 +195,8 @@ def compute_scores(
     calibration_results: List[BenchmarkResult] | None = None,
 ) -> List[Comparison]:
     scores: List[Comparison] = []
-    baseline_times: Dict[str, float] = baseline.get("baseline_times", {})
-    calibration_times: Dict[str, float] = baseline.get("calibration_times", {})
+    baseline_times = times_by_digits(baseline.get("baseline_times", {}))
+    calibration_times = times_by_digits(baseline.get("calibration_times", {}))
     scoring_system = baseline.get("scoring_system", {})
     baseline_score = scoring_system.get("baseline_score", 200)
     max_score = scoring_system.get("max_score", 1000)
@@ -90,8 +206,8 @@ def compute_scores(
     }
 
     for result in results:
-        base_time = baseline_times.get(str(result.digits))
-        base_calibration = calibration_times.get(str(result.digits))
+        base_time = baseline_times.get(result.digits)
+        base_calibration = calibration_times.get(result.digits)
         calibration = calibration_by_digits.get(result.digits)
         machine_scale = None
         normalized = result.time_seconds
@@ -121,39 +237,53 @@ def compute_scores(
     return scores
 
 
-def write_report(comparisons: List[Comparison], baseline_meta: Dict, destination: Path) -> None:
+REPORT_RULE = "-" * 91 + "\n"
+REPORT_ROW = "{digits:12d} {measured:15.6f} {normalized:15.6f} {baseline:15.6f} {scale:8.3f} {ratio:>9} {score:7d}\n".format
+
+
+def format_report(comparisons: List[Comparison], baseline_meta: Dict) -> str:
+    lines: List[str] = []
+    append = lines.append
+    append("INTEGER BENCHMARK REPORT\n")
+    append("========================\n")
+    append(f"Generated: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+    append("\n")
+    if baseline_meta:
+        info = baseline_meta.get("baseline_info", {})
+        append("Baseline Reference\n")
+        append(f"  Timestamp: {info.get('timestamp', 'n/a')}\n")
+        append(f"  Seed:      {info.get('seed', 'n/a')}\n")
+        append("\n")
+    append(
+        f"{'Digits':>12} {'Measured(s)':>15} {'Normalized(s)':>15} "
+        f"{'Baseline(s)':>15} {'Scale':>8} {'vs Base':>9} {'Score':>7}\n"
+    )
+    append(REPORT_RULE)
+    total = 0
+    for comparison in comparisons:
+        append(REPORT_ROW(
+            digits=comparison.digits,
+            measured=comparison.measured,
+            normalized=comparison.normalized,
+            baseline=comparison.baseline or 0.0,
+            scale=comparison.machine_scale or 1.0,
+            ratio=f"{comparison.ratio:>7.2f}x" if comparison.ratio is not None else "   n/a",
+            score=comparison.score,
+        ))
+        total += comparison.score
+    avg = total / len(comparisons) if comparisons else 0
+    append(REPORT_RULE)
+    append(f"Total Score:   {total}\n")
+    append(f"Average Score: {avg:.1f}\n")
+    return "".join(lines)
+
+
+def write_report(comparisons: List[Comparison], baseline_meta: Dict, destination: Path) -> str:
+    # Format once; the caller can reuse the returned text (e.g. for stdout) without rebuilding it.
+    report = format_report(comparisons, baseline_meta)
     destination.parent.mkdir(parents=True, exist_ok=True)
-    with destination.open("w", encoding="utf-8") as handle:
-        handle.write("INTEGER BENCHMARK REPORT\n")
-        handle.write("========================\n")
-        handle.write(f"Generated: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
-        handle.write("\n")
-        if baseline_meta:
-            info = baseline_meta.get("baseline_info", {})
-            handle.write("Baseline Reference\n")
-            handle.write(f"  Timestamp: {info.get('timestamp', 'n/a')}\n")
-            handle.write(f"  Seed:      {info.get('seed', 'n/a')}\n")
-            handle.write("\n")
-        handle.write(
-            f"{'Digits':>12} {'Measured(s)':>15} {'Normalized(s)':>15} "
-            f"{'Baseline(s)':>15} {'Scale':>8} {'vs Base':>9} {'Score':>7}\n"
-        )
-        handle.write("-" * 91 + "\n")
-        total = 0
-        for comparison in comparisons:
-            ratio_display = f"{comparison.ratio:>7.2f}x" if comparison.ratio is not None else "   n/a"
-            baseline_display = f"{comparison.baseline:>15.6f}" if comparison.baseline else f"{0:>15.6f}"
-            scale_display = f"{comparison.machine_scale:>8.3f}" if comparison.machine_scale else f"{1:>8.3f}"
-            handle.write(
-                f"{comparison.digits:12d} {comparison.measured:15.6f} "
-                f"{comparison.normalized:15.6f} {baseline_display} "
-                f"{scale_display} {ratio_display:>9} {comparison.score:7d}\n"
-            )
-            total += comparison.score
-        avg = total / len(comparisons) if comparisons else 0
-        handle.write("-" * 91 + "\n")
-        handle.write(f"Total Score:   {total}\n")
-        handle.write(f"Average Score: {avg:.1f}\n")
+    destination.write_text(report, encoding="utf-8")
+    return report
 
 
 def main(argv: List[str]) -> int:
@@ -164,25 +294,46 @@ def main(argv: List[str]) -> int:
     parser.add_argument("--baseline", type=Path, default=Path("data/baseline.json"))
     parser.add_argument("--results-dir", type=Path, default=Path("results"))
     parser.add_argument("--skip-build", action="store_true", help="Skip the cmake build step")
+    parser.add_argument("--repetitions", type=int, default=5, help="Benchmark repetitions; the median is scored")
+    parser.add_argument("--pgo", action="store_true", help="Build with profile-guided optimization (GCC only)")
+    parser.add_argument("--cpu", type=int, help="Pin the benchmark run to this CPU core to reduce timing noise")
     args = parser.parse_args(argv)
+    if args.pgo and args.binary:
+        parser.error("--pgo builds its own benchmark binary and cannot be combined with --binary")
+    if args.cpu is not None:
+        cpu_error = cpu_pinning_error(args.cpu)
+        if cpu_error:
+            parser.error(cpu_error)
 
     build_dir = args.build_dir
-    if not args.skip_build:
-        if args.preset:
-            run_process(["cmake", "--preset", args.preset])
-        run_process(["cmake", "--build", str(build_dir), "--target", "integer_benchmark"])
-
     if args.binary:
         benchmark_binary = args.binary
+    elif args.pgo:
+        benchmark_binary = pgo_build_dir(build_dir) / "benchmarks" / "integer_benchmark"
     else:
         benchmark_binary = build_dir / "benchmarks" / "integer_benchmark"
     if sys.platform == "win32":
         benchmark_binary = benchmark_binary.with_suffix(".exe")
 
+    if not args.skip_build:
+        if args.preset:
+            run_process(["cmake", "--preset", args.preset])
+        if args.pgo:
+            try:
+                build_with_pgo(pgo_build_dir(build_dir), benchmark_binary)
+            except subprocess.CalledProcessError as error:
+                # run_process captures output; show why cmake refused (e.g. PGO on a non-GCC compiler)
+                print(error.stderr, end="", file=sys.stderr)
+                return 1
+        else:
+            run_process(["cmake", "--build", str(build_dir), "--target", "integer_benchmark"])
+
     if not benchmark_binary.exists():
         raise FileNotFoundError(f"Benchmark executable not found: {benchmark_binary}")
 
-    completed = run_process([str(benchmark_binary), "--benchmark_format=json"])
+    if args.cpu is not None:
+        pin_to_cpu(args.cpu)
+    completed = run_process(benchmark_command(benchmark_binary, args.repetitions))
     payload = json.loads(completed.stdout)
     results = parse_benchmark_payload(payload)
     calibration_results = parse_calibration_payload(payload)
@@ -196,7 +347,8 @@ def main(argv: List[str]) -> int:
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     report_path = args.results_dir / f"benchmark_{timestamp}.txt"
-    write_report(comparisons, baseline, report_path)
+    report = write_report(comparisons, baseline, report_path)
+    print(report, end="")
     print(f"Report written to {report_path}")
     return 0
 
@@ -20,7 +20,13 @@ def main(argv: list[str]) -> int:
     parser.add_argument("--baseline", type=Path, default=Path("data/baseline.json"))
     parser.add_argument("--seed", type=int, default=1024, help="Optional seed metadata for reproducibility")
     parser.add_argument("--skip-build", action="store_true")
+    parser.add_argument("--repetitions", type=int, default=5, help="Benchmark repetitions; the median is stored")
+    parser.add_argument("--cpu", type=int, help="Pin the benchmark run to this CPU core to reduce timing noise")
     args = parser.parse_args(argv)
+    if args.cpu is not None:
+        cpu_error = bench.cpu_pinning_error(args.cpu)
+        if cpu_error:
+            parser.error(cpu_error)
 
     build_dir = args.build_dir
     if not args.skip_build:
@@ -33,7 +39,9 @@ def main(argv: list[str]) -> int:
     if not benchmark_binary.exists():
         raise FileNotFoundError(f"Benchmark executable not found: {benchmark_binary}")
 
-    completed = bench.run_process([str(benchmark_binary), "--benchmark_format=json"])
+    if args.cpu is not None:
+        bench.pin_to_cpu(args.cpu)
+    completed = bench.run_process(bench.benchmark_command(benchmark_binary, args.repetitions))
     payload = json.loads(completed.stdout)
     measurements = bench.parse_benchmark_payload(payload)
     calibration_measurements = bench.parse_calibration_payload(payload)
@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 import argparse
+import marshal
+import operator
+import os
 import subprocess
 import sys
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
-# Increase integer string conversion limit for large number tests
-sys.set_int_max_str_digits(0)
+# Increase integer string conversion limit for large number tests (the limit only exists on Python 3.11+)
+if hasattr(sys, "set_int_max_str_digits"):
+    sys.set_int_max_str_digits(0)
 
 def run_process(command, cwd=None, input_str=None):
     try:
@@ -17,12 +24,52 @@ def run_process(command, cwd=None, input_str=None):
         print(f"Stderr: {e.stderr}")
         raise
 
-def generate_large_int(digits):
+def start_calculator(calculator_bin):
+    # One calculator process serves every request of the run; it answers one line per request.
+    # It exits on its own once its stdin closes, i.e. when the owning (worker) process goes away.
+    return subprocess.Popen([str(calculator_bin)], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+def calculator_failed(proc):
+    return subprocess.CalledProcessError(proc.wait(), proc.args)
+
+def describe_calculator_error(error):
+    return f"Error running command: {error.cmd} (exit code {error.returncode})"
+
+def run_calculator(proc, op, a, b, results=1):
+    # Stream the operands straight into stdin so multi-megabyte inputs are never joined into one buffer
+    try:
+        proc.stdin.write(op.encode("ascii"))
+        proc.stdin.write(b" ")
+        proc.stdin.write(a)
+        proc.stdin.write(b" ")
+        proc.stdin.write(b)
+        proc.stdin.write(b"\n")
+        proc.stdin.flush()
+    except BrokenPipeError:
+        raise calculator_failed(proc) from None
+    outputs = []
+    for _ in range(results):
+        output = proc.stdout.readline()
+        if not output:
+            raise calculator_failed(proc)
+        outputs.append(output.strip().decode("ascii"))
+    return outputs[0] if results == 1 else outputs
+
+# Maps every byte value onto an ASCII digit; bytes >= 250 are dropped so each digit stays uniform
+DIGIT_TABLE = bytes(ord("0") + value % 10 for value in range(256))
+BIASED_BYTES = bytes(range(250, 256))
+
+def rand_digits(digits, rng):
+    # Draw whole byte buffers and translate them in C instead of looping per digit in Python
     if digits <= 1:
-        return random.randint(0, 9)
-    start = 10**(digits-1)
-    end = (10**digits) - 1
-    return random.randint(start, end)
+        return str(rng.randint(0, 9)).encode("ascii")
+    buffer = bytearray()
+    while len(buffer) < digits:
+        buffer += rng.randbytes(digits - len(buffer) + 16).translate(DIGIT_TABLE, BIASED_BYTES)
+    del buffer[digits:]
+    if buffer[0] == ord("0"):
+        buffer[0] = ord("1") + rng.randrange(9)
+    return bytes(buffer)
 
 def find_executable(build_dir, name):
     # Try common locations
@@ -37,30 +84,104 @@ def find_executable(build_dir, name):
             return c.absolute()
     return None
 
-def test_operation(calculator_bin, op, a, b):
-    # Calculate in Python
-    if op == "+":
-        expected = a + b
-    elif op == "-":
-        expected = a - b
-    elif op == "*":
-        expected = a * b
-    elif op == "/":
-        expected = a // b
-    else:
-        return False
+OPERATIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.floordiv,
+}
+
+def test_operations(calculator, a, b, x, y):
+    # Returns (failure message or None, time spent in the calculator round-trip in ns)
+    # One "all" request sends the operands once and answers every operation, in OPERATIONS order
+    start_ns = time.perf_counter_ns()
+    outputs = run_calculator(calculator, "all", a, b, results=len(OPERATIONS))
+    elapsed_ns = time.perf_counter_ns() - start_ns
     
-    input_str = f"{op} {a} {b}\n"
-    res = run_process([str(calculator_bin)], input_str=input_str)
-    output = res.stdout.strip()
+    for (op, operation), output in zip(OPERATIONS.items(), outputs):
+        # Calculate in Python on the already parsed operands x == int(a), y == int(b)
+        expected = operation(x, y)
+        # Parse the answer instead of formatting the reference: int() is several times faster than str() on big values
+        if not output.isdigit() or int(output) != expected:
+            # Returned rather than printed so that only the first failure of a parallel run is shown
+            return "\n".join([
+                "\nFAILED TEST:",
+                f"Operation: {a.decode()} {op} {b.decode()}",
+                f"Expected:  {expected}",
+                f"Got:       {output}",
+            ]), elapsed_ns
+    return None, elapsed_ns
+
+# Each pool worker keeps its own persistent calculator process
+calculator = None
+calculator_error = None
+
+def init_worker(calculator_bin):
+    global calculator, calculator_error
+    calculator = start_calculator(calculator_bin)
+    # Warm-up request: process startup and loading happen here, outside every timed round-trip.
+    # A failure is kept for run_test to report; raising here would only break the pool.
+    try:
+        run_calculator(calculator, "+", b"0", b"0")
+    except subprocess.CalledProcessError as error:
+        calculator_error = error
+
+def generate_operands(seed, digits):
+    # Tests are independent, so every test derives its operands from its own seed
+    rng = random.Random(seed)
+
+    # Generate random digits count close to the requested size (variance +- 10%)
+    d_min = int(digits * 0.9)
+    d_max = int(digits * 1.1)
+    if d_min < 1: d_min = 1
     
-    if str(expected) != output:
-        print(f"\nFAILED TEST:")
-        print(f"Operation: {a} {op} {b}")
-        print(f"Expected:  {expected}")
-        print(f"Got:       {output}")
-        return False
-    return True
+    digits_a = rng.randint(d_min, d_max)
+    digits_b = rng.randint(d_min, d_max)
+
+    a = rand_digits(digits_a, rng)
+    b = rand_digits(digits_b, rng)
+    # Parse each operand once; decimal parsing is quadratic and would otherwise repeat per operation
+    return a, b, int(a), int(b)
+
+def load_operands(seed, digits, cache_dir):
+    # Operands depend only on (seed, digits). The cache keeps the parsed ints too: marshal
+    # reloads them in linear time, while int() on a million digits takes seconds.
+    # Delete the cache directory after changing how operands are generated.
+    if cache_dir is None:
+        return generate_operands(seed, digits)
+    path = cache_dir / f"op_{seed.replace('/', '_')}_{digits}.bin"
+    try:
+        return marshal.loads(path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    operands = generate_operands(seed, digits)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    partial.write_bytes(marshal.dumps(operands))
+    os.replace(partial, path)
+    return operands
+
+def run_test(seed, digits, cache_dir):
+    # Returns (failure message or None, calculator time in ns, worker pid)
+    worker = os.getpid()
+    if calculator_error is not None:
+        return describe_calculator_error(calculator_error), 0, worker
+    a, b, x, y = load_operands(seed, digits, cache_dir)
+    
+    # Division needs a non-zero divisor; only single-digit operands can be zero
+    if a == b"0": a, x = b"1", 1
+    if b == b"0": b, y = b"1", 1
+    
+    # Subtraction needs a >= b just in case the library does not support negative numbers yet
+    # Digit strings carry no leading zeros, so (length, bytes) orders them numerically
+    if (len(a), a) < (len(b), b): a, b, x, y = b, a, y, x
+    
+    # Test addition, subtraction, multiplication and division in one round-trip
+    try:
+        failure, elapsed_ns = test_operations(calculator, a, b, x, y)
+    except subprocess.CalledProcessError as error:
+        return describe_calculator_error(error), 0, worker
+    return failure, elapsed_ns, worker
 
 def main():
     parser = argparse.ArgumentParser(description="Verify integer arithmetic correctness against Python")
@@ -68,6 +189,10 @@ def main():
     parser.add_argument("--skip-build", action="store_true")
     parser.add_argument("--num-tests", type=int, default=50)
     parser.add_argument("--digits", type=int, default=100000, help="Approximate number of digits for test numbers")
+    parser.add_argument("--seed", type=int, default=1024, help="Seed for the operand generator")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of tests to run in parallel")
+    parser.add_argument("--cache-dir", type=Path, default=Path("results/.cache"), help="Directory caching generated operands")
+    parser.add_argument("--no-cache", action="store_true", help="Always regenerate operands")
     args = parser.parse_args()
     
     if not args.skip_build:
@@ -84,47 +209,40 @@ def main():
         sys.exit(1)
         
     print(f"Using executable: {calculator_bin}")
-    import time
 
-    print(f"Running {args.num_tests} random tests per operation with approx {args.digits} digits...")
+    print(f"Running {args.num_tests} random tests per operation with approx {args.digits} digits (seed {args.seed}, {args.jobs} jobs)...")
     
     start_time = time.perf_counter()
-    ops = ["+", "-", "*", "/"]
     
-    for i in range(args.num_tests):
-        # Generate random digits count close to the requested size (variance +- 10%)
-        d_min = int(args.digits * 0.9)
-        d_max = int(args.digits * 1.1)
-        if d_min < 1: d_min = 1
-        
-        digits_a = random.randint(d_min, d_max)
-        digits_b = random.randint(d_min, d_max)
-
-        a = generate_large_int(digits_a)
-        b = generate_large_int(digits_b)
-        
-        # Test Addition
-        if not test_operation(calculator_bin, "+", a, b): return 1
-        
-        # Test Subtraction 
-        # We ensure a >= b just in case the library does not support negative numbers yet
-        if a < b: a, b = b, a
-        if not test_operation(calculator_bin, "-", a, b): return 1
-        
-        # Test Multiplication
-        if not test_operation(calculator_bin, "*", a, b): return 1
-        
-        # Test Division
-        if b == 0: b = 1
-        if not test_operation(calculator_bin, "/", a, b): return 1
-        
-        if (i+1) % 10 == 0:
-            print(f"Completed {i+1}/{args.num_tests} tests...")
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=(calculator_bin,)) as executor:
+        seeds = [f"{args.seed}/{i}" for i in range(args.num_tests)]
+        cache_dir = None if args.no_cache else args.cache_dir
+        results = executor.map(run_test, seeds, [args.digits] * args.num_tests, [cache_dir] * args.num_tests)
+        calculator_ns_by_worker = {}
+        try:
+            for i, (failure, elapsed_ns, worker) in enumerate(results):
+                if failure is not None:
+                    # Report the first failure only and drop the tests still queued
+                    print(failure)
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return 1
+                calculator_ns_by_worker[worker] = calculator_ns_by_worker.get(worker, 0) + elapsed_ns
+                if (i+1) % 10 == 0:
+                    print(f"Completed {i+1}/{args.num_tests} tests...")
+        except BrokenProcessPool:
+            print("A test worker died unexpectedly")
+            executor.shutdown(wait=False, cancel_futures=True)
+            return 1
 
     end_time = time.perf_counter()
     total_time = end_time - start_time
     print(f"\nAll tests passed successfully in {total_time:.2f} seconds!")
+    # Workers run concurrently, so their times are not summed; the busiest worker bounds the calculator's share
+    # of the wall time. Each calculator answered a warm-up request first, so startup is not included.
+    busiest_ns = max(calculator_ns_by_worker.values(), default=0)
+    print(f"Calculator round-trips: {busiest_ns / 1e9:.2f} seconds in the busiest of "
+          f"{len(calculator_ns_by_worker)} workers (excluding process startup)")
     return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,5 +1,6 @@
 #pragma once
 
+#include <algorithm>
 #include <chrono>
 #include <cstdint>
 #include <cstdlib>
@@ -7,6 +8,7 @@
 #include <initializer_list>
 #include <iostream>
 #include <map>
+#include <regex>
 #include <sstream>
 #include <string>
 #include <utility>
@@ -164,15 +166,43 @@ inline BenchmarkResult run_one(const Benchmark &benchmark, const std::vector<std
     return {full_name(benchmark, args), benchmark.unit(), iterations, elapsed / static_cast<double>(iterations)};
 }
 
-inline std::vector<BenchmarkResult> run_registered_benchmarks() {
+struct Options {
+    bool json = false;
+    int repetitions = 1;
+    std::string filter;
+};
+
+inline Options parse_options(int argc, char **argv) {
+    constexpr const char *repetitions_flag = "--benchmark_repetitions=";
+    constexpr const char *filter_flag = "--benchmark_filter=";
+    Options options;
+    for (int i = 1; i < argc; ++i) {
+        if (std::strcmp(argv[i], "--benchmark_format=json") == 0)
+            options.json = true;
+        else if (std::strncmp(argv[i], repetitions_flag, std::strlen(repetitions_flag)) == 0)
+            options.repetitions = std::max(1, std::atoi(argv[i] + std::strlen(repetitions_flag)));
+        else if (std::strncmp(argv[i], filter_flag, std::strlen(filter_flag)) == 0)
+            options.filter = argv[i] + std::strlen(filter_flag);
+    }
+    return options;
+}
+
+inline std::vector<BenchmarkResult> run_registered_benchmarks(const Options &options, const std::regex &filter) {
+    // Like Google Benchmark: the filter is searched for in the full name, and each repetition is its own row.
     std::vector<BenchmarkResult> results;
+    const auto run_matching = [&](const Benchmark &benchmark, const std::vector<std::int64_t> &args) {
+        if (!std::regex_search(full_name(benchmark, args), filter))
+            return;
+        for (int repetition = 0; repetition < options.repetitions; ++repetition)
+            results.push_back(run_one(benchmark, args));
+    };
     for (const Benchmark *benchmark: registry()) {
         const auto &all_args = benchmark->args();
         if (all_args.empty()) {
-            results.push_back(run_one(*benchmark, {}));
+            run_matching(*benchmark, {});
         } else {
             for (const auto &args: all_args)
-                results.push_back(run_one(*benchmark, args));
+                run_matching(*benchmark, args);
         }
     }
     return results;
@@ -203,13 +233,16 @@ inline void print_text(const std::vector<BenchmarkResult> &results) {
 }
 
 inline int RunSpecifiedBenchmarks(int argc, char **argv) {
-    bool json = false;
-    for (int i = 1; i < argc; ++i) {
-        if (std::strcmp(argv[i], "--benchmark_format=json") == 0)
-            json = true;
+    const Options options = parse_options(argc, argv);
+    std::regex filter;
+    try {
+        filter = std::regex(options.filter.empty() ? std::string(".") : options.filter);
+    } catch (const std::regex_error &error) {
+        std::cerr << "Invalid --benchmark_filter '" << options.filter << "': " << error.what() << std::endl;
+        return 1;
     }
-    const auto results = run_registered_benchmarks();
-    if (json)
+    const auto results = run_registered_benchmarks(options, filter);
+    if (options.json)
         print_json(results);
     else
         print_text(results);